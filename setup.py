@@ -24,5 +24,8 @@ setup(name='zmq-plugin',
       # scripts.
       install_requires=['arrow>=0.7.0', 'jsonschema', 'pandas', 'pyyaml',
                         'pyzmq'],
+      # Optional packages used (if installed) to speed up message
+      # validation and serialization.
+      extras_require={'fast': ['fastjsonschema', 'orjson']},
       # Install data listed in `MANIFEST.in`
       include_package_data=True)
@@ -1,3 +1,7 @@
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
+
+# Send/receive high water mark of **hub** and plugin sockets (default in
+# `libzmq` is 1000 messages).
+HIGH_WATER_MARK = 10000
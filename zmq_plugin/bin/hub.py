@@ -5,7 +5,7 @@ import sys
 
 from zmq_plugin.bin import verify_tornado
 verify_tornado()
-from zmq.eventloop import ioloop, zmqstream
+from zmq.eventloop import ioloop
 
 logger = logging.getLogger(__name__)
 
@@ -16,13 +16,8 @@ def run_hub(task, log_level=None):
 
     task.reset()
 
-    # Register on receive callback.
-    task.command_stream = zmqstream.ZMQStream(task.command_socket)
-    task.command_stream.on_recv(task.on_command_recv)
-
-    # Register on receive callback.
-    task.query_stream = zmqstream.ZMQStream(task.query_socket)
-    task.query_stream.on_recv(task.on_query_recv)
+    # Register on receive callbacks.
+    task.install_streams()
 
     try:
         ioloop.install()
@@ -6,7 +6,7 @@ import sys
 from zmq_plugin.bin import verify_tornado
 verify_tornado()
 import zmq
-from zmq.eventloop import ioloop, zmqstream
+from zmq.eventloop import ioloop
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +17,8 @@ def run_plugin(task, log_level=None):
 
     task.reset()
 
-    # Register on receive callback.
-    task.command_stream = zmqstream.ZMQStream(task.command_socket)
-    task.command_stream.on_recv(task.on_command_recv)
-
-    # Register on receive callback.
-    task.query_stream = zmqstream.ZMQStream(task.subscribe_socket)
-    task.query_stream.on_recv(task.on_subscribe_recv)
+    # Register on receive callbacks.
+    task.install_streams()
 
     try:
         ioloop.install()
@@ -54,18 +49,39 @@ def parse_args(args=None):
     log_levels = ('critical', 'error', 'warning', 'info', 'debug', 'notset')
     parser.add_argument('-l', '--log-level', type=str, choices=log_levels,
                         default='info')
-    parser.add_argument('-s', '--subscribe-opts', type=str, default=None)
+    parser.add_argument('-s', '--subscribe-opts', type=str, action='append',
+                        default=None, help='Comma-separated `OPTION:value` '
+                        'socket options (e.g., `SUBSCRIBE:plugin_a` or '
+                        '`RCVHWM:5`).  May be repeated; values of a repeated '
+                        'option are collected into a list (e.g., to subscribe '
+                        'to multiple sources).')
     parser.add_argument('hub_uri')
     parser.add_argument('name', type=str)
 
     args = parser.parse_args()
     args.log_level = getattr(logging, args.log_level.upper())
     if args.subscribe_opts is not None:
-        subscribe_opts = dict([[v.strip() for v in
-                                args.subscribe_opts.split(':')]
-                               for kv in args.subscribe_opts.split(',')])
-        args.subscribe_opts = dict([(getattr(zmq, k), v)
-                                    for k, v in subscribe_opts.items()])
+        from ..plugin import BYTES_SOCKET_OPTIONS
+
+        subscribe_opts = {}
+        for kv in ','.join(args.subscribe_opts).split(','):
+            k, v = [s.strip() for s in kv.split(':', 1)]
+            option = getattr(zmq, k)
+            if option not in BYTES_SOCKET_OPTIONS:
+                # Value of non-binary option (e.g., `RCVHWM`) is an integer.
+                try:
+                    v = int(v)
+                except ValueError:
+                    parser.error('Value of socket option `%s` must be an '
+                                 'integer (got `%s`).' % (k, v))
+            if option in subscribe_opts:
+                # Collect values of repeated option into a list.
+                if not isinstance(subscribe_opts[option], list):
+                    subscribe_opts[option] = [subscribe_opts[option]]
+                subscribe_opts[option].append(v)
+            else:
+                subscribe_opts[option] = v
+        args.subscribe_opts = subscribe_opts
     return args
 
 
@@ -3,7 +3,7 @@ from multiprocessing import Process
 import logging
 
 import zmq
-from zmq.eventloop import ioloop, zmqstream
+from zmq.eventloop import ioloop
 from tornado.ioloop import PeriodicCallback
 
 logger = logging.getLogger(__name__)
@@ -14,13 +14,8 @@ def run_hub(task):
 
     task.reset()
 
-    # Register on receive callback.
-    task.command_stream = zmqstream.ZMQStream(task.command_socket)
-    task.command_stream.on_recv(task.on_command_recv)
-
-    # Register on receive callback.
-    task.query_stream = zmqstream.ZMQStream(task.query_socket)
-    task.query_stream.on_recv(task.on_query_recv)
+    # Register on receive callbacks.
+    task.install_streams()
 
     def dump_registry():
         print('\n' + (72 * '*') + '\n')
@@ -42,13 +37,8 @@ def run_plugin(task):
 
     task.reset()
 
-    # Register on receive callback.
-    task.command_stream = zmqstream.ZMQStream(task.command_socket)
-    task.command_stream.on_recv(task.on_command_recv)
-
-    # Register on receive callback.
-    task.query_stream = zmqstream.ZMQStream(task.subscribe_socket)
-    task.query_stream.on_recv(task.on_subscribe_recv)
+    # Register on receive callbacks.
+    task.install_streams()
 
     try:
         ioloop.install()
@@ -1,18 +1,49 @@
 # coding: utf-8
-from collections import OrderedDict
-import inspect
 import itertools
-import json
 import logging
 import re
+import sys
 
 import zmq
 import jsonschema
-from .schema import validate, get_connect_reply, get_execute_reply
+from . import HIGH_WATER_MARK
+from .schema import (validate, get_connect_reply, get_execute_reply,
+                     encode_message, decode_message, MESSAGE_SCHEMA)
 
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; used to parse the query URI of each `Hub` instance.
+_HOST_CRE = re.compile(r'^(?P<transport>[^:]+)://(?P<host>[^:]+)'
+                       r'(:(?P<port>\d+))?')
+
+# Number of I/O threads requested for the shared ZeroMQ context.  Using (at
+# least) two I/O threads allows *command* and *publish* traffic to be handled
+# by separate threads (see `zmq.AFFINITY`).
+IO_THREADS = 2
+
+# Encoded `msg_type` frame for each message type (see `Hub._publish`).
+_MSG_TYPE_FRAMES = dict((msg_type, msg_type.encode('utf-8'))
+                        for msg_type in MESSAGE_SCHEMA['definitions']['header']
+                        ['properties']['msg_type']['enum'])
+
+
+def _encode(value):
+    '''
+    Encode text as UTF-8 bytes (bytes are returned as-is).
+    '''
+    return value if isinstance(value, bytes) else value.encode('utf-8')
+
+
+def _frame_bytes(frame):
+    '''
+    Return contents of message frame as bytes.
+
+    Frames are either bytes or, if received with ``copy=False``,
+    :class:`zmq.Frame` instances.
+    '''
+    return frame if isinstance(frame, bytes) else frame.bytes
+
 
 class Hub(object):
     '''
@@ -39,57 +70,119 @@ class Hub(object):
         about other sockets.
     name : str
         Unique name across all plugins.
+    publish_enabled : bool, optional
+        See :attr:`publish_enabled`.
 
     Attributes
     ----------
+    callbacks : dict
+        Registry of functions to call upon receiving ``execute_reply``
+        messages, keyed by the ``session`` field of the
+        ``execute_request``/``execute_reply`` header.
+
+        Each callback is removed once called.
     command_socket : zmq.Socket
         Plugins send command requests to the command socket.
+    command_stream : zmq.eventloop.zmqstream.ZMQStream
+        Event loop stream of command socket (see :meth:`install_streams`).
     command_uri : str
         The URI address of the command socket.
 
-        Command URI is determined at time of binding (bound to random port).
+        Command URI is determined at time of binding (bound to random port
+        for ``tcp`` transport).
+    context : zmq.Context
+        Shared ZeroMQ context, configured with :data:`IO_THREADS` I/O threads
+        (set by :meth:`reset`).
     host : str
         Host name or IP address.
     name : str
         Hub name (**MUST** be unique across all plugins).
+    publish_enabled : bool
+        If ``True`` (default), broadcast each message processed by the hub
+        over the publish socket.
+
+        Set to ``False`` to skip serializing and sending a copy of every
+        message when no plugin monitors the publish socket.
     publish_socket : zmq.Socket
         Hub broadcasts messages to plugins over the publish socket.
+    publish_stream : zmq.eventloop.zmqstream.ZMQStream
+        Event loop stream of publish socket (see :meth:`install_streams`).
     publish_uri : str
         The URI address of the publish socket.
 
-        Publish URI is determined at time of binding (bound to random port).
+        Publish URI is determined at time of binding (bound to random port
+        for ``tcp`` transport).
     query_socket : zmq.Socket
         Plugins connect to the query socket to register and query information
         about other sockets.
+    query_stream : zmq.eventloop.zmqstream.ZMQStream
+        Event loop stream of query socket (see :meth:`install_streams`).
     query_uri : str
         The URI address of the query socket.
-    registry : OrderedDict
-        Registry of connected plugins.
+    registry : dict
+        Registry of connected plugins (in order of registration).
+    subscriptions : set
+        Topics currently subscribed to on the publish socket, or ``None`` if
+        not known, i.e., if (un)subscription reports are not processed (see
+        :meth:`install_streams` and :meth:`on_publish_recv`).
     transport : str
         Transport (e.g., "tcp", "inproc").
-    '''
-    def __init__(self, query_uri, name='hub'):
-        host_cre = re.compile(r'^(?P<transport>[^:]+)://(?P<host>[^:]+)'
-                              r'(:(?P<port>\d+)?)')
 
-        match = host_cre.search(query_uri)
+        Hub and plugins running within the same process may share the
+        ``inproc`` transport (e.g., ``inproc://hub``), which bypasses the
+        network stack entirely.
+    '''
+    def __init__(self, query_uri, name='hub', publish_enabled=True):
+        match = _HOST_CRE.match(query_uri)
         self.transport = match.group('transport')
         self.host = match.group('host')
+        # Base URI of *command* and *publish* sockets (built once).
+        self._base_uri = '%s://%s' % (self.transport, self.host)
 
         self.name = name
+        # ZeroMQ identity of command socket (encoded once).
+        self._name_bytes = _encode(name)
 
         self.query_uri = query_uri
         self.query_socket = None
 
+        # Context is retrieved in `reset()` (i.e., in the thread that creates
+        # the sockets).
+        self.context = None
+
         # Command URI is determined at time of binding (bound to random port).
         self.command_uri = None
         self.command_socket = None
         # Publish URI is determined at time of binding (bound to random port).
         self.publish_uri = None
         self.publish_socket = None
-
-        # Registry of connected plugins.
-        self.registry = OrderedDict()
+        self.publish_enabled = publish_enabled
+        self.subscriptions = None
+        # Socket info sent in `connect_reply` messages (see `socket_info`).
+        self._socket_info = None
+
+        # Registry of connected plugins (`dict` preserves insertion order).
+        self.registry = {}
+
+        # Registry of functions to call upon receiving `execute_reply`
+        # messages, keyed by the `session` field of the
+        # `execute_request`/`execute_reply` header.
+        self.callbacks = {}
+
+        # Method-specific loggers, keyed by method name (see `logger`).
+        self._loggers = {}
+
+        # Query message handlers, keyed by message type.
+        self._query_handlers = {'connect_request':
+                                self._process__connect_request,
+                                'execute_request':
+                                self._process__execute_request}
+
+        # Bound `on_execute__<command>` methods, keyed by command name.
+        self._execute_handlers = dict((name[len('on_execute__'):],
+                                       getattr(self, name))
+                                      for name in dir(self)
+                                      if name.startswith('on_execute__'))
 
     @property
     def logger(self):
@@ -98,10 +191,33 @@ class Hub(object):
         Logger configured with a name in the following form::
 
             <module_name>.<class_name>.<method_name>->"<self.name>"
+
+        Loggers are cached by calling method name.
+        '''
+        # N.B., `sys._getframe` only looks up the calling frame, whereas
+        # `inspect.stack()` builds info (including source context) for every
+        # frame in the stack.
+        method_name = sys._getframe(1).f_code.co_name
+        logger_ = self._loggers.get(method_name)
+        if logger_ is None:
+            logger_ = logging.getLogger('.'.join((__name__,
+                                                  type(self).__name__,
+                                                  method_name)) +
+                                        '->"%s"' % self.name)
+            self._loggers[method_name] = logger_
+        return logger_
+
+    def close(self):
+        '''
+        Close all sockets.
+
+        Pending messages are discarded (i.e., sockets are closed with
+        ``linger=0``) so that shutdown does not block.
         '''
-        return logging.getLogger('.'.join((__name__, str(type(self).__name__),
-                                           inspect.stack()[1][3]))
-                                 + '->"%s"' % self.name)
+        for socket in (self.query_socket, self.command_socket,
+                       self.publish_socket):
+            if socket is not None:
+                socket.close(linger=0)
 
     def reset(self):
         '''
@@ -113,23 +229,61 @@ class Hub(object):
           - Resetting the ``publish``, ``query``, and ``command`` sockets.
         '''
         self.execute_reply_id = itertools.count(1)
+        # N.B., `io_threads` only applies if the shared context instance has
+        # not been created yet.
+        self.context = zmq.Context.instance(io_threads=IO_THREADS)
         self.reset_publish_socket()
         self.reset_query_socket()
         self.reset_command_socket()
 
+    def install_streams(self, io_loop=None):
+        '''
+        Register :meth:`on_query_recv`, :meth:`on_command_recv`, and
+        :meth:`on_publish_recv` as receive callbacks of the *query*, *command*,
+        and *publish* sockets, respectively, using
+        :class:`zmq.eventloop.zmqstream.ZMQStream` instances.
+
+        Incoming messages are then processed by the event loop as soon as the
+        sockets are ready (no manual polling is required).  Since
+        (un)subscriptions are then tracked, messages are only published while
+        at least one plugin is subscribed (see :attr:`publishing`).
+
+        **N.B.,** requires the ``tornado`` package.  Must be called after
+        :meth:`reset` (in the same thread).
+
+        Parameters
+        ----------
+        io_loop : tornado.ioloop.IOLoop, optional
+            Event loop to register streams with (default: current loop).
+        '''
+        from zmq.eventloop.zmqstream import ZMQStream
+
+        self.query_stream = ZMQStream(self.query_socket, io_loop)
+        self.query_stream.on_recv(self.on_query_recv)
+        self.command_stream = ZMQStream(self.command_socket, io_loop)
+        # N.B., receive command frames without copying so forwarded message
+        # buffers are passed through to the target (and publish) socket as-is.
+        self.command_stream.on_recv(self.on_command_recv, copy=False)
+        self.publish_stream = ZMQStream(self.publish_socket, io_loop)
+        self.publish_stream.on_recv(self.on_publish_recv)
+        if self.subscriptions is None:
+            # All (un)subscriptions are now reported to `on_publish_recv`
+            # (reports not yet received remain queued on the socket), so
+            # nobody is subscribed until a subscription is reported.
+            self.subscriptions = set()
+
     def reset_query_socket(self):
         '''
         Create and configure *query* socket (existing socket is destroyed if it
         exists).
         '''
-        context = zmq.Context.instance()
-
         if self.query_socket is not None:
-            self.query_socket.close()
+            # Discard any pending messages (socket is being replaced).
+            self.query_socket.close(linger=0)
             self.query_socket = None
 
         # Create command socket and assign name as identity.
-        self.query_socket = zmq.Socket(context, zmq.REP)
+        self.query_socket = zmq.Socket(self.context, zmq.REP)
         self.query_socket.bind(self.query_uri)
 
     def reset_command_socket(self):
@@ -137,35 +291,90 @@ class Hub(object):
         Create and configure *command* socket (existing socket is destroyed if
         it exists).
         '''
-        context = zmq.Context.instance()
-
         if self.command_socket is not None:
-            self.command_socket.close()
+            # Discard any pending messages (socket is being replaced).
+            self.command_socket.close(linger=0)
             self.command_socket = None
 
         # Create command socket and assign name as identity.
-        self.command_socket = zmq.Socket(context, zmq.ROUTER)
-        self.command_socket.setsockopt(zmq.IDENTITY, bytes(self.name))
-        base_uri = "%s://%s" % (self.transport, self.host)
-        self.command_port = self.command_socket.bind_to_random_port(base_uri)
-        self.command_uri = base_uri + (':%s' % self.command_port)
+        self.command_socket = zmq.Socket(self.context, zmq.ROUTER)
+        self.command_socket.setsockopt(zmq.IDENTITY, self._name_bytes)
+        self.command_socket.setsockopt(zmq.SNDHWM, HIGH_WATER_MARK)
+        self.command_socket.setsockopt(zmq.RCVHWM, HIGH_WATER_MARK)
+        self._set_affinity(self.command_socket, 0)
+        self.command_uri, self.command_port = self._bind(self.command_socket,
+                                                         'command')
+        self._socket_info = None
 
     def reset_publish_socket(self):
         '''
         Create and configure *publish* socket (existing socket is destroyed if
         it exists).
         '''
-        context = zmq.Context.instance()
-
         if self.publish_socket is not None:
-            self.publish_socket.close()
+            # Discard any pending messages (socket is being replaced).
+            self.publish_socket.close(linger=0)
             self.publish_socket = None
 
-        # Create publish socket and assign name as identity.
-        self.publish_socket = zmq.Socket(context, zmq.PUB)
-        base_uri = "%s://%s" % (self.transport, self.host)
-        self.publish_port = self.publish_socket.bind_to_random_port(base_uri)
-        self.publish_uri = base_uri + (':%s' % self.publish_port)
+        # Create publish socket.
+        #
+        # N.B., an `XPUB` socket behaves like a `PUB` socket, but also reports
+        # (un)subscriptions (see `on_publish_recv`).
+        self.publish_socket = zmq.Socket(self.context, zmq.XPUB)
+        self.publish_socket.setsockopt(zmq.SNDHWM, HIGH_WATER_MARK)
+        self._set_affinity(self.publish_socket, 1)
+        self.publish_uri, self.publish_port = self._bind(self.publish_socket,
+                                                         'publish')
+        self._socket_info = None
+        # Subscriptions are unknown until reports from the socket are processed
+        # (see `install_streams`).
+        self.subscriptions = None
+
+    def _set_affinity(self, socket, io_thread):
+        '''
+        Assign socket to the specified I/O thread of :attr:`context`.
+
+        If the context has a single I/O thread, the socket is left as-is.
+
+        Parameters
+        ----------
+        socket : zmq.Socket
+            Socket to configure (**MUST** not be bound yet).
+        io_thread : int
+            Index of I/O thread.
+        '''
+        io_threads = self.context.get(zmq.IO_THREADS)
+        if io_threads > 1:
+            socket.setsockopt(zmq.AFFINITY, 1 << (io_thread % io_threads))
+
+    def _bind(self, socket, socket_name):
+        '''
+        Bind socket to a new endpoint on the hub host.
+
+        For ``tcp`` transport, the socket is bound to a random port.  Other
+        transports (e.g., ``inproc``, ``ipc``) do not use ports, so the socket
+        is bound to an endpoint derived from the query URI instead (e.g.,
+        ``inproc://hub-command`` for the ``inproc://hub`` query URI).
+
+        Parameters
+        ----------
+        socket : zmq.Socket
+            Socket to bind.
+        socket_name : str
+            Name of socket (e.g., ``'command'``, ``'publish'``).
+
+        Returns
+        -------
+        tuple
+            ``(uri, port)``, where ``port`` is ``None`` for transports other
+            than ``tcp``.
+        '''
+        if self.transport == 'tcp':
+            port = socket.bind_to_random_port(self._base_uri)
+            return '%s:%d' % (self._base_uri, port), port
+        uri = '%s-%s' % (self._base_uri, socket_name)
+        socket.bind(uri)
+        return uri, None
 
     def query_send(self, message):
         '''
@@ -173,10 +382,82 @@ class Hub(object):
 
         Parameters
         ----------
-        message : str
+        message : str or bytes
             Encoded json reply.
+
+        Returns
+        -------
+        bytes
+            Encoded json reply.  Can be used, for example, to broadcast
+            message over publish socket.
+        '''
+        message = _encode(message)
+        self.query_socket.send(message, copy=False)
+        return message
+
+    def on_publish_recv(self, msg_frames):
+        '''
+        Process (un)subscription messages reported by *publish* socket.
+
+        Each message is a single frame, where the first byte is ``1`` for a
+        subscription or ``0`` for an unsubscription, followed by the
+        subscription topic (i.e., prefix).
+
+        Only the first subscription to a topic and the last unsubscription from
+        a topic are reported, so, once all reports are processed (e.g., after
+        :meth:`install_streams`), :attr:`subscriptions` is empty exactly when
+        no plugin is subscribed to the *publish* socket.
+
+        Parameters
+        ----------
+        msg_frames : list
+            Multi-part ZeroMQ message.
         '''
-        self.query_socket.send(message)
+        if self.subscriptions is None:
+            self.subscriptions = set()
+        for frame in msg_frames:
+            if not frame:
+                continue
+            # N.B., indexing `bytes` yields an `int`.
+            if frame[0] == 1:
+                self.subscriptions.add(frame[1:])
+            elif frame[0] == 0:
+                self.subscriptions.discard(frame[1:])
+
+    @property
+    def publishing(self):
+        '''
+        bool: ``True`` if messages are currently broadcast over the *publish*
+        socket.
+
+        Messages are broadcast if :attr:`publish_enabled` is set, unless
+        :attr:`subscriptions` are known to be empty (i.e., nobody is
+        listening).
+        '''
+        return self.publish_enabled and (self.subscriptions is None or
+                                         bool(self.subscriptions))
+
+    def _publish(self, header, message_json):
+        '''
+        Broadcast serialized message over *publish* socket (only if
+        :attr:`publishing`).
+
+        The ``source``, ``target`` and ``msg_type`` header fields are sent as
+        leading frames (i.e., usable as subscription prefix), followed by the
+        already serialized message.
+
+        Parameters
+        ----------
+        header : dict
+            Message header.
+        message_json : bytes or zmq.Frame
+            Message serialized as json.
+        '''
+        if not self.publishing:
+            return
+        msg_frames = [_encode(header['source']), _encode(header['target']),
+                      _MSG_TYPE_FRAMES[header['msg_type']], message_json]
+        self.publish_socket.send_multipart(msg_frames, copy=False)
 
     def on_execute__register(self, request):
         '''
@@ -184,15 +465,18 @@ class Hub(object):
 
         Returns
         -------
-        OrderedDict
-            Registry contents.
+        list
+            Names of registered plugins (in order of registration).
+
+            Registry keys and values are identical, so only the names are
+            sent (i.e., half the reply size of sending the mapping).
         '''
         source = request['header']['source']
         # Add name of client to registry.
         self.registry[source] = source
         self.logger.debug('Added "%s" to registry', source)
         # Respond with registry contents.
-        return self.registry
+        return list(self.registry)
 
     def on_execute__ping(self, request):
         '''
@@ -224,42 +508,62 @@ class Hub(object):
 
         .. _`here`: http://learning-0mq-with-pyzmq.readthedocs.org/en/latest/pyzmq/multisocket/tornadoeventloop.html
         '''
-        # Publish raw message frames to *publish* socket.
         try:
             # Decode message from first (and only expected) frame.
-            request = json.loads(msg_frames[0])
-            # Validate message against schema.
+            request = decode_message(msg_frames[0])
+            # Validate message against schema (only incoming messages are
+            # validated; replies are built by the `schema.get_..._reply`
+            # helpers).
             validate(request)
-        except jsonschema.ValidationError:
+        except (ValueError, jsonschema.ValidationError) as exception:
             self.logger.error('unexpected request', exc_info=True)
-            self.reset_query_socket()
+            self._query_error_reply(exception)
+            return
 
         try:
-            self.publish_socket.send_multipart(list(map(str,
-                                                   [request['header']['source'],
-                                                    request['header']['target'],
-                                                    request['header']
-                                                    ['msg_type'],
-                                                    msg_frames[0]])))
             message_type = request['header']['msg_type']
-            if message_type == 'connect_request':
-                reply = self._process__connect_request(request)
-            elif message_type == 'execute_request':
-                reply = self._process__execute_request(request)
-            else:
+            handler = self._query_handlers.get(message_type)
+            if handler is None:
                 raise RuntimeError('Unrecognized message type: %s' %
                                    message_type)
+            reply = handler(request)
             reply['header']['source'] = self.name
-            reply_json = json.dumps(reply)
-            self.query_send(reply_json)
-            self.publish_socket.send_multipart(list(map(str,
-                                                   [reply['header']['source'],
-                                                    reply['header']['target'],
-                                                    reply['header']
-                                                    ['msg_type'], reply_json])))
-        except:
+            # Serialize reply once and share bytes between reply and publish.
+            reply_json = encode_message(reply)
+        except Exception as exception:
             self.logger.error('Error processing request.', exc_info=True)
-            self.reset_query_socket()
+            self._query_error_reply(exception)
+            return
+
+        try:
+            self.query_send(reply_json)
+            # Publish raw request frame (no need to re-encode) and reply
+            # back-to-back, *after* the reply has been sent.  This keeps the
+            # publish socket off the reply path and lets `libzmq` batch both
+            # messages.
+            self._publish(request['header'], msg_frames[0])
+            self._publish(reply['header'], reply_json)
+        except Exception:
+            self.logger.error('Error sending reply.', exc_info=True)
+
+    def _query_error_reply(self, error):
+        '''
+        Send error reply to request that could not be processed.
+
+        The *query* socket is a ``REP`` socket, so *every* request **MUST** be
+        answered before the next request can be received.  Replying (rather
+        than replacing the socket) keeps the socket, and any stream registered
+        with it (see :meth:`install_streams`), usable.
+
+        Parameters
+        ----------
+        error : Exception
+            Error encountered while processing request.
+        '''
+        try:
+            self.query_send(encode_message({'error': str(error)}))
+        except zmq.ZMQError:
+            self.logger.error('Error sending error reply.', exc_info=True)
 
     def on_command_recv(self, msg_frames):
         '''
@@ -288,38 +592,45 @@ class Hub(object):
         Parameters
         ----------
         msg_frames : list
-            Multi-part ZeroMQ message.
+            Multi-part ZeroMQ message, as either bytes or :class:`zmq.Frame`
+            instances (i.e., if received with ``copy=False``).
 
 
         .. _`here`: http://learning-0mq-with-pyzmq.readthedocs.org/en/latest/pyzmq/multisocket/tornadoeventloop.html
         '''
-        try:
-            source, null, message_str = msg_frames
-        except:
-            self.logger.error('Unexpected message', exc_info=True)
+        if len(msg_frames) != 3:
+            self.logger.error('Unexpected message (expected 3 frames, got '
+                              '%d)', len(msg_frames))
             return
+        source, null, message_frame = msg_frames
 
         try:
-            # Decode message from first (and only expected) frame.
-            message = json.loads(message_str, encoding='utf-8')
+            # Decode message from last frame.
+            # N.B., decode directly from frame buffer (i.e., without first
+            # copying contents to `bytes`).
+            message = decode_message(message_frame.buffer
+                                     if isinstance(message_frame, zmq.Frame)
+                                     else message_frame)
             # Validate message against schema.
             validate(message)
-        except jsonschema.ValidationError:
+        except (ValueError, jsonschema.ValidationError):
+            # N.B., `UnicodeDecodeError` is a subclass of `ValueError`.
             self.logger.error('Unexpected message', exc_info=True)
             return
-        except UnicodeDecodeError:
-            import pdb; pdb.set_trace()
-            return
 
         # Message has been validated.  Verify message source matches header.
-        try:
-            if not message['header']['source'] == source:
-                raise NameError('Message source (%s) does not header source '
-                                'field (%s).' % (source,
-                                                 message['header']['source']))
-        except:
-            self.logger.error('Source mismatch.', exc_info=True)
+        #
+        # N.B., *source* frame is the ROUTER identity of the sender (`bytes`),
+        # whereas header fields and registry keys are `str`.  Compare as
+        # bytes, since an identity assigned by ZeroMQ (i.e., if not set
+        # explicitly by the sender) is not necessarily valid UTF-8.
+        source_bytes = _frame_bytes(source)
+        if not _encode(message['header']['source']) == source_bytes:
+            self.logger.error('Source mismatch.  Message source (%r) does not '
+                              'match header source field (%s).', source_bytes,
+                              message['header']['source'])
             return
+        source = message['header']['source']
 
         # Determine whether target is another plugin or the **hub** and process
         # message accordingly.
@@ -327,11 +638,11 @@ class Hub(object):
         if source in self.registry and target in self.registry:
             # Both *source* and *target* are present in the local registry.
             # Forward message to *target* plugin.
-            self._process__forwarding_command_message(message)
+            self._process__forwarding_command_message(message, msg_frames)
         elif (source in self.registry and target == self.name):
             # Message *source* is in the local registry and *target* is
             # **hub**.
-            self._process__local_command_message(message)
+            self._process__local_command_message(message, message_frame)
         else:
             error_msg = ('Unsupported source(%s)/target(%s) '
                          'configuration.  Either source and target both '
@@ -359,16 +670,16 @@ class Hub(object):
 
         Returns
         -------
-        str
+        bytes
             Message serialized as json.  Can be used, for example, to broadcast
             message over publish socket.
         '''
-        message_json = json.dumps(message)
-        msg_frames = list(map(str, [message['header']['target'], '', message_json]))
-        self.command_socket.send_multipart(msg_frames)
+        message_json = encode_message(message)
+        msg_frames = [_encode(message['header']['target']), b'', message_json]
+        self.command_socket.send_multipart(msg_frames, copy=False)
         return message_json
 
-    def _process__forwarding_command_message(self, message):
+    def _process__forwarding_command_message(self, message, msg_frames):
         '''
         Process validated message from *command* socket, which is addressed
         from one plugin to another.
@@ -381,15 +692,21 @@ class Hub(object):
         ----------
         message : dict
             Message to forward to *target*.
+        msg_frames : list
+            Multi-part ZeroMQ message, as received, i.e., ``[source, '',
+            message_json]`` (frames may be bytes or :class:`zmq.Frame`
+            instances).
+
+            The routing frame is replaced *in-place* by the *target* identity
+            and the frames are forwarded as-is (i.e., without re-serializing
+            :data:`message`).
         '''
-        message_json = self._send_command_message(message)
+        msg_frames[0] = _encode(message['header']['target'])
+        self.command_socket.send_multipart(msg_frames, copy=False)
         if 'content' in message and not message['content'].get('silent'):
-            msg_frames = [message['header']['source'],
-                          message['header']['target'],
-                          message['header']['msg_type'], message_json]
-            self.publish_socket.send_multipart(list(map(str, msg_frames)))
+            self._publish(message['header'], msg_frames[-1])
 
-    def _process__local_command_message(self, message):
+    def _process__local_command_message(self, message, message_json=None):
         '''
         Process validated message from *command* socket, where the **hub** is
         either the *source* or the *target* (not both).
@@ -402,26 +719,31 @@ class Hub(object):
         ----------
         message : dict
             Message to forward to *target*.
+        message_json : bytes or zmq.Frame, optional
+            Raw message frame, as received.  If provided, it is published
+            as-is (i.e., without re-serializing :data:`message`).
         '''
-        message_json = json.dumps(message)
-        if 'content' in message and not message['content'].get('silent'):
-            msg_frames = [message['header']['source'],
-                          message['header']['target'],
-                          message['header']['msg_type'], message_json]
-            self.publish_socket.send_multipart(list(map(str, msg_frames)))
+        publish = (self.publishing and 'content' in message and
+                   not message['content'].get('silent'))
+        if publish and message_json is None:
+            message_json = encode_message(message)
         message_type = message['header']['msg_type']
         if message_type == 'execute_request':
             reply = self._process__execute_request(message)
             reply_json = self._send_command_message(reply)
-            if not message['content'].get('silent'):
-                msg_frames = [reply['header']['source'],
-                              reply['header']['target'],
-                              reply['header']['msg_type'], reply_json]
-                self.publish_socket.send_multipart(list(map(str, msg_frames)))
-        elif message_type == 'execute_reply':
-            self._process__execute_reply(message)
+            if publish:
+                # Publish request and reply back-to-back, *after* the reply has
+                # been sent.
+                self._publish(message['header'], message_json)
+                self._publish(reply['header'], reply_json)
         else:
-            self.logger.error('Unrecognized message type: %s', message_type)
+            if publish:
+                self._publish(message['header'], message_json)
+            if message_type == 'execute_reply':
+                self._process__execute_reply(message)
+            else:
+                self.logger.error('Unrecognized message type: %s',
+                                  message_type)
 
     def _process__connect_request(self, request):
         '''
@@ -441,14 +763,24 @@ class Hub(object):
         source = request['header']['source']
         # Add name of client to registry.
         self.registry[source] = source
-        # Send list of registered clients.
-        socket_info = {'command': {'uri': self.command_uri,
-                                    'port': self.command_port,
-                                    'name': self.name},
-                       'publish': {'uri': self.publish_uri,
-                                   'port': self.publish_port}}
-        reply = get_connect_reply(request, content=socket_info)
-        return validate(reply)
+        # Send socket info (built once per socket reset; see `socket_info`).
+        return get_connect_reply(request, content=self.socket_info)
+
+    @property
+    def socket_info(self):
+        '''
+        dict: Connection info of *command* and *publish* sockets, sent to
+        plugins in ``connect_reply`` messages.
+
+        Cached until the *command* or *publish* socket is reset.
+        '''
+        if self._socket_info is None:
+            self._socket_info = {'command': {'uri': self.command_uri,
+                                             'port': self.command_port,
+                                             'name': self.name},
+                                 'publish': {'uri': self.publish_uri,
+                                             'port': self.publish_port}}
+        return self._socket_info
 
     def _process__execute_request(self, request):
         '''
@@ -473,23 +805,24 @@ class Hub(object):
         dict
             ``execute_reply`` message.
         '''
+        # Each request consumes exactly one execution count (even if an
+        # exception is raised while processing the request).
+        execution_count = next(self.execute_reply_id)
         try:
-            func = getattr(self, 'on_execute__' +
-                           request['content']['command'], None)
+            command = request['content']['command']
+            func = self._execute_handlers.get(command)
             if func is None:
-                error = NameError('Unrecognized command: %s' %
-                                  request['content']['command'])
-                reply = get_execute_reply(request,
-                                          next(self.execute_reply_id),
-                                          error=error)
-            else:
-                result = func(request)
-                reply = get_execute_reply(request,
-                                          next(self.execute_reply_id),
-                                          data=result)
-            return validate(reply)
-        except (Exception, ) as exception:
-            return get_execute_reply(request, next(self.execute_reply_id),
+                # Fall back to attribute look up (e.g., for method added to
+                # instance after construction).
+                func = getattr(self, 'on_execute__' + command, None)
+            if func is None:
+                error = NameError('Unrecognized command: %s' % command)
+                return get_execute_reply(request, execution_count,
+                                         error=error)
+            result = func(request)
+            return get_execute_reply(request, execution_count, data=result)
+        except Exception as exception:
+            return get_execute_reply(request, execution_count,
                                      error=exception)
 
     def _process__execute_reply(self, reply):
@@ -506,13 +839,11 @@ class Hub(object):
         '''
         try:
             session = reply['header']['session']
-            if session in self.callbacks:
-                # A callback was registered for the corresponding request.
+            # Remove callback (if any) registered for the corresponding
+            # request, so one-shot callbacks do not accumulate.
+            func = self.callbacks.pop(session, None)
+            if func is not None:
                 # Call callback with reply.
-                func = self.callbacks[session]
                 func(reply)
-            else:
-                # No callback registered for session.
-                pass
-        except:
+        except Exception:
             self.logger.error('Processing error.', exc_info=True)
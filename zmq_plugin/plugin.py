@@ -2,22 +2,33 @@
 from collections import OrderedDict
 from datetime import datetime
 from pprint import pformat
-import pickle as pickle
-import inspect
 import itertools
-import json
 import logging
 import re
+import sys
 
 import jsonschema
 import zmq
 
+from . import HIGH_WATER_MARK
 from .schema import (validate, get_connect_request, get_execute_request,
-                     get_execute_reply, decode_content_data, mime_type)
+                     get_execute_reply, decode_content_data, mime_type,
+                     encode_message, decode_message)
 
 # Create module-level logger.
 logger = logging.getLogger(__name__)
 
+# Compiled once; used to parse the hub query URI of each plugin instance.
+_HOST_CRE = re.compile(r'^(?P<transport>[^:]+)://(?P<host>[^:]+)'
+                       r'(:(?P<port>\d+))?')
+
+# Maximum duration (in milliseconds) :meth:`PluginBase.execute` waits for a
+# message on the command socket between timeout checks/`wait_func` calls.
+EXECUTE_POLL_INTERVAL_MS = 10
+# Socket options with binary (rather than integer) values, e.g., for
+# :attr:`PluginBase.subscribe_options`.
+BYTES_SOCKET_OPTIONS = (zmq.SUBSCRIBE, zmq.UNSUBSCRIBE, zmq.IDENTITY)
+
 
 class PluginBase(object):
     '''
@@ -47,12 +58,16 @@ class PluginBase(object):
 
     Attributes
     ----------
-    callbacks : OrderedDict
+    callbacks : dict
         Registry of functions to call upon receiving ``execute_reply``
         messages, keyed by the ``session`` field of the
         ``execute_request``/``execute_reply`` header.
     command_socket : zmq.Socket
         Used to send command requests to the **hub** command socket.
+    command_stream : zmq.eventloop.zmqstream.ZMQStream
+        Event loop stream of command socket (see :meth:`install_streams`).
+    context : zmq.Context
+        Shared ZeroMQ context (set by :meth:`reset`).
     execute_reply_id : itertools.count
         Reply message count iterator.
 
@@ -71,19 +86,25 @@ class PluginBase(object):
         :attr:`subscribe_socket` using the :meth:`setsockopt` method.
 
         This is useful, for instance, to set the subscription filter.
+
+        The **hub** publishes messages as ``[source, target, msg_type,
+        message_json]`` frames, so messages are filtered (by ZeroMQ, before
+        reaching Python) by prefix of the *source* name, e.g.,
+        ``{zmq.SUBSCRIBE: 'plugin_a'}``.  Text values are encoded as UTF-8,
+        and a list of values applies the option once per value (e.g., to
+        subscribe to multiple sources).
     subscribe_socket : zmq.Socket
         Hub broadcasts messages to all plugins over the publish socket.
+    subscribe_stream : zmq.eventloop.zmqstream.ZMQStream
+        Event loop stream of subscribe socket (see :meth:`install_streams`).
     transport : str
         Transport (e.g., "tcp", "inproc").
     '''
     def __init__(self, name, query_uri, subscribe_options=None):
         self.name = name
-
-        host_cre = re.compile(r'^(?P<transport>[^:]+)://'
-                              r'(?P<host>[^:]+)'
-                              r'(:(?P<port>\d+)?)')
-
-        match = host_cre.search(query_uri)
+        # Identity of command socket (encoded once).
+        self._name_bytes = name.encode('utf-8')
+        match = _HOST_CRE.match(query_uri)
         self.transport = match.group('transport')
         self.host = match.group('host')
 
@@ -91,6 +112,13 @@ class PluginBase(object):
         self.query_uri = query_uri
         self.query_socket = None
         self.command_socket = None
+        # URI that `command_socket` is connected to.
+        self._command_socket_uri = None
+        # Poller for `command_socket` (created along with socket).
+        self._command_poller = None
+        # Context is retrieved in `reset()` (i.e., in the thread that creates
+        # the sockets).
+        self.context = None
         self.subscribe_options = subscribe_options or {}
         self.subscribe_socket = None
         self.execute_reply_id = itertools.count(1)
@@ -98,16 +126,34 @@ class PluginBase(object):
         # Registry of functions to call upon receiving `execute_reply`
         # messages, keyed by the `session` field of the
         # `execute_request`/`execute_reply` header.
-        self.callbacks = OrderedDict()
+        self.callbacks = {}
+
+        # Method-specific loggers, keyed by method name (see `logger`).
+        self._loggers = {}
+
+        # Command message handlers, keyed by message type.
+        self._command_handlers = {'execute_request':
+                                  self._process__execute_request,
+                                  'execute_reply':
+                                  self._process__execute_reply}
+
+        # Bound `on_execute__<command>` methods, keyed by command name.
+        self._execute_handlers = dict((name[len('on_execute__'):],
+                                       getattr(self, name))
+                                      for name in dir(self)
+                                      if name.startswith('on_execute__'))
 
     def close(self):
         '''
         Close all sockets.
+
+        Pending messages are discarded (i.e., sockets are closed with
+        ``linger=0``) so that shutdown does not block.
         '''
         for socket in (self.query_socket, self.command_socket,
                        self.subscribe_socket):
             if socket is not None:
-                socket.close()
+                socket.close(linger=0)
 
     def reset(self):
         '''
@@ -121,14 +167,21 @@ class PluginBase(object):
           - Registering with the central **hub**.
         '''
         self.execute_reply_id = itertools.count(1)
+        # Look up shared context once for all sockets.
+        self.context = zmq.Context.instance()
 
         self.reset_query_socket()
 
         # Get socket info and **hub** name.
         connect_request = get_connect_request(self.name, self.hub_name)
         reply = self.query(connect_request)
-        self.hub_name = bytes(reply['header']['source'])
+        self.hub_name = reply['header']['source']
+        # Routing frame for messages sent to the **hub** (encoded once).
+        self._hub_name_bytes = self.hub_name.encode('utf-8')
         self.hub_socket_info = reply['content']
+        # URIs of **hub** sockets (resolved once per hub connection).
+        self._command_uri = self._hub_uri('command')
+        self._subscribe_uri = self._hub_uri('publish')
 
         # Initialize sockets using obtained socket info.
         self.reset_subscribe_socket()
@@ -137,6 +190,33 @@ class PluginBase(object):
         # Explicitly register with the **hub** and retrieve plugin registry.
         self.register()
 
+    def install_streams(self, io_loop=None):
+        '''
+        Register :meth:`on_command_recv` and :meth:`on_subscribe_recv` as
+        receive callbacks of the *command* and *subscribe* sockets,
+        respectively, using :class:`zmq.eventloop.zmqstream.ZMQStream`
+        instances.
+
+        Incoming messages are then processed by the event loop as soon as the
+        sockets are ready (no polling with non-blocking receives is required).
+
+        **N.B.,** requires the ``tornado`` package.  Must be called after
+        :meth:`reset` (in the same thread).
+
+        Parameters
+        ----------
+        io_loop : tornado.ioloop.IOLoop, optional
+            Event loop to register streams with (default: current loop).
+        '''
+        from zmq.eventloop.zmqstream import ZMQStream
+
+        self.command_stream = ZMQStream(self.command_socket, io_loop)
+        # N.B., receive command frames without copying (see
+        # `on_command_recv`).
+        self.command_stream.on_recv(self.on_command_recv, copy=False)
+        self.subscribe_stream = ZMQStream(self.subscribe_socket, io_loop)
+        self.subscribe_stream.on_recv(self.on_subscribe_recv)
+
     def register(self):
         '''
         Register as a plugin with the central **hub**.
@@ -150,8 +230,13 @@ class PluginBase(object):
         '''
         connect_request = get_execute_request(self.name, self.hub_name,
                                               'register')
+        # N.B., reply is validated by `query`.
         reply = self.query(connect_request)
-        self.plugin_registry = decode_content_data(reply)
+        # N.B., **hub** replies with the names of registered plugins (older
+        # hubs reply with a `name -> name` mapping; iterating over either
+        # yields the names).
+        names = decode_content_data(reply, validated=True)
+        self.plugin_registry = OrderedDict((name, name) for name in names)
         self.logger.info('Registered with hub at "%s"', self.query_uri)
 
     ###########################################################################
@@ -161,12 +246,12 @@ class PluginBase(object):
         Create and configure :attr:`query_socket` socket (existing socket is
         destroyed if it exists).
         '''
-        context = zmq.Context.instance()
-
         if self.query_socket is not None:
+            # Discard any pending messages (socket is being replaced).
+            self.query_socket.close(linger=0)
             self.query_socket = None
 
-        self.query_socket = zmq.Socket(context, zmq.REQ)
+        self.query_socket = zmq.Socket(self.context, zmq.REQ)
         self.query_socket.connect(self.query_uri)
 
     def query(self, request, **kwargs):
@@ -180,11 +265,12 @@ class PluginBase(object):
             ``<...>_request`` message.
         '''
         try:
-            self.query_socket.send(json.dumps(request))
-            reply = json.loads(self.query_socket.recv(**kwargs))
+            self.query_socket.send(encode_message(request), copy=False)
+            reply = decode_message(self.query_socket.recv(**kwargs))
             validate(reply)
             return reply
-        except:
+        except (zmq.ZMQError, ValueError, jsonschema.ValidationError):
+            # N.B., `zmq.Again` (i.e., receive timeout) is a `zmq.ZMQError`.
             self.logger.error('Query error', exc_info=True)
             self.reset_query_socket()
             raise
@@ -195,30 +281,75 @@ class PluginBase(object):
         Return logger configured with a name in the following form:
 
             <module_name>.<class_name>.<method_name>->"<self.name>"
+
+        Loggers are cached by calling method name.
+        '''
+        # N.B., `sys._getframe` only looks up the calling frame, whereas
+        # `inspect.stack()` builds info (including source context) for every
+        # frame in the stack.
+        method_name = sys._getframe(1).f_code.co_name
+        logger_ = self._loggers.get(method_name)
+        if logger_ is None:
+            logger_ = logging.getLogger('.'.join((__name__,
+                                                  type(self).__name__,
+                                                  method_name)) +
+                                        '->"%s"' % self.name)
+            self._loggers[method_name] = logger_
+        return logger_
+
+    def _hub_uri(self, socket_name):
         '''
-        return logging.getLogger('.'.join((__name__, str(type(self).__name__),
-                                           inspect.stack()[1][3]))
-                                 + '->"%s"' % self.name)
+        Parameters
+        ----------
+        socket_name : str
+            Name of **hub** socket (i.e., ``'command'`` or ``'publish'``).
+
+        Returns
+        -------
+        str
+            URI to connect to the specified **hub** socket.
+
+            For transports without ports (e.g., ``inproc``, ``ipc``), the URI
+            advertised by the **hub** is used as-is.
+        '''
+        socket_info = self.hub_socket_info[socket_name]
+        if socket_info['port'] is None:
+            return socket_info['uri']
+        return '%s://%s:%s' % (self.transport, self.host, socket_info['port'])
 
     ###########################################################################
     # Command socket methods
     def reset_command_socket(self):
         '''
-        Create and configure :attr:`command_socket` socket (existing socket is
-        destroyed if it exists).
-        '''
-        context = zmq.Context.instance()
+        Create and configure :attr:`command_socket` socket, unless the
+        existing socket can be reused.
 
+        If the existing socket is still open, belongs to :attr:`context`, and
+        is already connected to the **hub** command URI, it is reused as-is
+        (ZeroMQ reconnects automatically), which also keeps any stream
+        registered by :meth:`install_streams` valid.  Otherwise, the existing
+        socket (if any) is destroyed and replaced.
+        '''
+        if (self.command_socket is not None and not self.command_socket.closed
+                and self.command_socket.context is self.context
+                and self._command_socket_uri == self._command_uri):
+            return
         if self.command_socket is not None:
+            # Discard any pending messages (socket is being replaced).
+            self.command_socket.close(linger=0)
             self.command_socket = None
 
         # Create command socket and assign name as identity.
-        self.command_socket = zmq.Socket(context, zmq.ROUTER)
-        self.command_socket.setsockopt(zmq.IDENTITY, bytes(self.name))
-        command_uri = '%s://%s:%s' % (self.transport, self.host,
-                                      self.hub_socket_info['command']['port'])
-        self.command_socket.connect(command_uri)
-        self.logger.info('Connected command socket to "%s"', command_uri)
+        self.command_socket = zmq.Socket(self.context, zmq.ROUTER)
+        self.command_socket.setsockopt(zmq.IDENTITY, self._name_bytes)
+        self.command_socket.setsockopt(zmq.SNDHWM, HIGH_WATER_MARK)
+        self.command_socket.setsockopt(zmq.RCVHWM, HIGH_WATER_MARK)
+        self.command_socket.connect(self._command_uri)
+        self._command_socket_uri = self._command_uri
+        self._command_poller = zmq.Poller()
+        self._command_poller.register(self.command_socket, zmq.POLLIN)
+        self.logger.info('Connected command socket to "%s"',
+                         self._command_uri)
 
     def send_command(self, request):
         '''
@@ -229,8 +360,9 @@ class PluginBase(object):
         request : dict
             Command request message.
         '''
-        self.command_socket.send_multipart(list(map(str, [self.hub_name, '',
-                                                     json.dumps(request)])))
+        self.command_socket.send_multipart([self._hub_name_bytes, b'',
+                                            encode_message(request)],
+                                           copy=False)
 
     def on_command_recv(self, frames):
         '''
@@ -244,7 +376,8 @@ class PluginBase(object):
         Parameters
         ----------
         msg_frames : list
-            Multi-part ZeroMQ message.
+            Multi-part ZeroMQ message, as either bytes or :class:`zmq.Frame`
+            instances (i.e., if received with ``copy=False``).
 
 
         .. _`here`: http://learning-0mq-with-pyzmq.readthedocs.org/en/latest/pyzmq/multisocket/tornadoeventloop.html
@@ -254,30 +387,39 @@ class PluginBase(object):
             Ignore received messages which are missing a third message frame
             and log to debug level.
         '''
+        # N.B., messages from the **hub** are ``[hub_name, '', message_json]``.
+        if len(frames) < 3:
+            self.logger.debug('missing message frame: `%s`', frames)
+            return
+
         message_str = frames[-1]
+        if isinstance(message_str, zmq.Frame):
+            # Decode message directly from frame buffer (i.e., without first
+            # copying contents to `bytes`).
+            message_str = message_str.buffer
 
         if not message_str:
             self.logger.debug('empty message: `%s`', frames)
             return
 
         try:
-            message = json.loads(message_str)
+            message = decode_message(message_str)
             validate(message)
         except jsonschema.ValidationError:
             self.logger.error('unexpected message: `%s`', message,
                               exc_info=True)
-        except Exception:
-            self.logger.error('unexpected message: `%s`', message_str,
+        except ValueError:
+            # Message is not valid json.
+            self.logger.error('unexpected message: `%s`', frames[-1],
                               exc_info=True)
         else:
             message_type = message['header']['msg_type']
-            if message_type == 'execute_request':
-                self._process__execute_request(message)
-            elif message_type == 'execute_reply':
-                self._process__execute_reply(message)
-            else:
+            handler = self._command_handlers.get(message_type)
+            if handler is None:
                 self.logger.error('Unrecognized message type: %s',
                                   message_type)
+            else:
+                handler(message)
 
     def _process__execute_reply(self, reply):
         '''
@@ -296,17 +438,13 @@ class PluginBase(object):
         '''
         try:
             session = reply['header']['session']
-            if session in self.callbacks:
-                # A callback was registered for the corresponding request.
-                func = self.callbacks[session]
-                # Remove callback.
-                del self.callbacks[session]
+            # Remove callback (if any) registered for the corresponding
+            # request.
+            func = self.callbacks.pop(session, None)
+            if func is not None:
                 # Call callback with reply.
                 func(reply)
-            else:
-                # No callback registered for session.
-                pass
-        except:
+        except Exception:
             self.logger.error('Processing error.', exc_info=True)
 
     def _process__execute_request(self, request):
@@ -330,13 +468,18 @@ class PluginBase(object):
 
             None
         '''
+        # Take one execution count per request (shared by error reply).
+        execution_count = next(self.execute_reply_id)
         try:
-            func = getattr(self, 'on_execute__' +
-                           request['content']['command'], None)
+            command = request['content']['command']
+            func = self._execute_handlers.get(command)
+            if func is None:
+                # Fall back to attribute look up (e.g., for method added to
+                # instance after construction).
+                func = getattr(self, 'on_execute__' + command, None)
             if func is None:
                 data = None
-                error = NameError('Unrecognized command: %s' %
-                                  request['content']['command'])
+                error = NameError('Unrecognized command: %s' % command)
                 mime_type = None
             else:
                 data = func(request)
@@ -344,20 +487,20 @@ class PluginBase(object):
                 mime_type = getattr(func, 'mime_type',
                                     'application/python-pickle')
                 error = None
-            reply = get_execute_reply(request, next(self.execute_reply_id),
-                                      data=data, error=error,
-                                      mime_type=mime_type)
-            validate(reply)
-            reply_str = json.dumps(reply)
-        except (Exception, ) as exception:
+            reply = get_execute_reply(request, execution_count, data=data,
+                                      error=error, mime_type=mime_type)
+        except Exception:
             import traceback
 
-            reply = get_execute_reply(request, next(self.execute_reply_id),
+            reply = get_execute_reply(request, execution_count,
                                       error=traceback.format_exc())
-                                      #error=exception)
-            reply_str = json.dumps(reply)
 
-        self.command_socket.send_multipart([self.hub_name, '', reply_str])
+        # N.B., reply is built by `get_execute_reply`, so it is not validated
+        # again; only received messages are validated.
+        reply_str = encode_message(reply)
+
+        self.command_socket.send_multipart([self._hub_name_bytes, b'',
+                                            reply_str], copy=False)
 
     ###########################################################################
     # Subscribe socket methods
@@ -366,22 +509,25 @@ class PluginBase(object):
         Create and configure :attr:`subscribe_socket` socket (existing socket
         is destroyed if it exists).
         '''
-        context = zmq.Context.instance()
-
         if self.subscribe_socket is not None:
+            # Discard any pending messages (socket is being replaced).
+            self.subscribe_socket.close(linger=0)
             self.subscribe_socket = None
 
         # Create subscribe socket and assign name as identity.
-        self.subscribe_socket = zmq.Socket(context, zmq.SUB)
+        self.subscribe_socket = zmq.Socket(self.context, zmq.SUB)
         if self.subscribe_options:
-            for k, v in self.subscribe_options.items():
-                self.subscribe_socket.setsockopt(k, v)
-                print('set sock opt', k, v)
-        subscribe_uri = '%s://%s:%s' % (self.transport, self.host,
-                                        self.hub_socket_info['publish']
-                                        ['port'])
-        self.subscribe_socket.connect(subscribe_uri)
-        self.logger.info('Connected subscribe socket to "%s"', subscribe_uri)
+            for k, values in self.subscribe_options.items():
+                if not isinstance(values, (list, tuple)):
+                    values = [values]
+                for v in values:
+                    if isinstance(v, str) and k in BYTES_SOCKET_OPTIONS:
+                        v = v.encode('utf-8')
+                    self.subscribe_socket.setsockopt(k, v)
+                    self.logger.debug('Set socket option: %s=%r', k, v)
+        self.subscribe_socket.connect(self._subscribe_uri)
+        self.logger.info('Connected subscribe socket to "%s"',
+                         self._subscribe_uri)
 
     def on_subscribe_recv(self, msg_frames):
         '''
@@ -395,14 +541,17 @@ class PluginBase(object):
         Parameters
         ----------
         msg_frames : list
-            Multi-part ZeroMQ message.
+            Multi-part ZeroMQ message, i.e., ``[source, target, msg_type,
+            message_json]``.
 
 
         .. _`here`: http://learning-0mq-with-pyzmq.readthedocs.org/en/latest/pyzmq/multisocket/tornadoeventloop.html
         '''
         try:
-            logger.info(pformat(pickle.loads(msg_frames[0])))
-        except:
+            # N.B., message is json (never unpickle data received from a
+            # socket).
+            logger.info(pformat(decode_message(msg_frames[-1])))
+        except ValueError:
             logger.error('Deserialization error', exc_info=True)
 
     ###########################################################################
@@ -520,8 +669,9 @@ class PluginBase(object):
 
         def _callback(reply):
             try:
-                result['data'] = decode_content_data(reply)
-            except (Exception, ) as exception:
+                # N.B., reply was validated by `on_command_recv`.
+                result['data'] = decode_content_data(reply, validated=True)
+            except Exception as exception:
                 result['error'] = exception
 
         session = self.execute_async(target_name, command, callback=_callback,
@@ -530,9 +680,9 @@ class PluginBase(object):
 
         start = datetime.now()
         while session in self.callbacks:
-            try:
-                msg_frames = self.command_socket.recv_multipart(zmq.NOBLOCK)
-            except zmq.Again:
+            # Block until a message is ready (or poll interval elapses) rather
+            # than spinning on non-blocking receives.
+            if not self._command_poller.poll(EXECUTE_POLL_INTERVAL_MS):
                 wait_duration_s = (datetime.now() - start).total_seconds()
                 if timeout_s is not None and (wait_duration_s > timeout_s):
                     raise IOError('Timed out waiting for response for request '
@@ -540,6 +690,8 @@ class PluginBase(object):
                 if wait_func is not None:
                     wait_func(wait_duration_s)
                 continue
+            msg_frames = self.command_socket.recv_multipart(zmq.NOBLOCK,
+                                                            copy=False)
             self.on_command_recv(msg_frames)
 
         if 'error' in result:
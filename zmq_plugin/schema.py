@@ -14,7 +14,6 @@ MESSAGE_SCHEMA : dict
 '''
 import base64
 import pickle as pickle
-import copy
 import json
 import uuid
 
@@ -24,6 +23,18 @@ import numpy as np
 import pandas as pd
 import yaml
 
+try:
+    # Optional: compile schemas to specialized Python validation functions.
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    # Optional: faster json encoding/decoding of messages.
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # ZeroMQ Plugin message format as [json-schema][1] (inspired by
 # [IPython messaging format][2]).
@@ -165,13 +176,15 @@ MESSAGE_SCHEMA = {
                   {'command': {'type': 'object',
                                'description': 'Command socket information.',
                                'properties': {'uri': {'type': 'string'},
-                                              'port': {'type': 'number'},
+                                              'port': {'type': ['number',
+                                                                'null']},
                                               'name': {'type': 'string'}},
                                'required': ['uri', 'port', 'name']},
                    'publish': {'type': 'object',
                                'description': 'Publish socket information.',
                                'properties': {'uri': {'type': 'string'},
-                                              'port': {'type': 'number'}},
+                                              'port': {'type': ['number',
+                                                                'null']}},
                                'required': ['uri', 'port']}},
                   'required': ['command', 'publish']}}}],
      'required': ['content', 'parent_header']}
@@ -180,18 +193,81 @@ MESSAGE_SCHEMA = {
 
 
 def get_schema(definition):
-    schema = copy.deepcopy(MESSAGE_SCHEMA)
+    # N.B., shallow copy; `definitions` is shared with `MESSAGE_SCHEMA`
+    # (schemas are never modified by the validators).
+    schema = dict(MESSAGE_SCHEMA)
     schema['allOf'] = [{'$ref': '#/definitions/%s' % definition}]
     return schema
 
 
 message_types = (['base_message'] + MESSAGE_SCHEMA['definitions']['header']
                  ['properties']['msg_type']['enum'])
-MESSAGE_SCHEMAS = dict([(k, get_schema(k)) for k in message_types])
+MESSAGE_SCHEMAS = {k: get_schema(k) for k in message_types}
+
+
+def _inline_refs(node, definitions):
+    '''
+    Return copy of schema node with each ``#/definitions/...`` reference
+    replaced by the referenced definition (recursively).
+
+    N.B., the message schema definitions are not recursive.
+    '''
+    if isinstance(node, dict):
+        ref = node.get('$ref')
+        if ref is not None and ref.startswith('#/definitions/'):
+            # N.B., keys beside `$ref` (e.g., `description`) are ignored by
+            # draft 4 validation.
+            return _inline_refs(definitions[ref[len('#/definitions/'):]],
+                                definitions)
+        return {k: _inline_refs(v, definitions) for k, v in node.items()}
+    elif isinstance(node, list):
+        return [_inline_refs(v, definitions) for v in node]
+    return node
+
+
+def get_validator(schema):
+    '''
+    Construct validation function for schema.
+
+    If the optional `fastjsonschema`_ package is installed, the schema is
+    compiled to a specialized Python function (typically much faster than
+    :class:`jsonschema.Draft4Validator`).  Otherwise, fall back to
+    :class:`jsonschema.Draft4Validator`, with ``$ref`` references inlined so
+    they are not resolved on every validation.
+
+    Parameters
+    ----------
+    schema : dict
+        JSON schema.
+
+    Returns
+    -------
+    function
+        Function accepting a single message argument.  In either case, a
+        :class:`jsonschema.ValidationError` is raised if validation fails.
+
+
+    .. _`fastjsonschema`: https://horejsek.github.io/python-fastjsonschema/
+    '''
+    if fastjsonschema is None:
+        definitions = schema.get('definitions', {})
+        flat_schema = _inline_refs({k: v for k, v in schema.items()
+                                    if k != 'definitions'}, definitions)
+        return jsonschema.Draft4Validator(flat_schema).validate
+
+    # N.B., do not fill in default values (i.e., do not modify message).
+    compiled_validate = fastjsonschema.compile(schema, use_default=False)
+
+    def _validate(message):
+        try:
+            compiled_validate(message)
+        except fastjsonschema.JsonSchemaException as exception:
+            raise jsonschema.ValidationError(str(exception))
+    return _validate
 
-# Pre-construct a validator for each message type.
-MESSAGE_VALIDATORS = dict([(k, jsonschema.Draft4Validator(v))
-                           for k, v in MESSAGE_SCHEMAS.items()])
+
+# Pre-construct a validation function for each message type.
+MESSAGE_VALIDATORS = {k: get_validator(v) for k, v in MESSAGE_SCHEMAS.items()}
 
 
 def validate(message):
@@ -209,15 +285,79 @@ def validate(message):
         Message.  A :class:`jsonschema.ValidationError` is raised if validation
         fails.
     '''
-    MESSAGE_VALIDATORS['base_message'].validate(message)
-
-    # Message validated as a basic message.  Now validate as specific type.
-    msg_type = message['header']['msg_type']
-    MESSAGE_VALIDATORS[msg_type].validate(message)
+    # N.B., each message type definition extends `base_message` (through
+    # `allOf`), so a single validation covers both.
+    try:
+        validator = MESSAGE_VALIDATORS[message['header']['msg_type']]
+    except (KeyError, TypeError):
+        # Missing or malformed header; validate as basic message to report
+        # the error.
+        validator = MESSAGE_VALIDATORS['base_message']
+    validator(message)
     return message
 
 
-def decode_content_data(message):
+def encode_message(message):
+    '''
+    Serialize message as json.
+
+    If the optional `orjson`_ package is installed, it is used to serialize
+    the message (falling back to :func:`json.dumps` for objects not supported
+    by `orjson`).
+
+    Parameters
+    ----------
+    message : dict
+        One of the message types defined in :data:`MESSAGE_SCHEMA`.
+
+    Returns
+    -------
+    bytes
+        Message serialized as UTF-8 encoded json.
+
+
+    .. _`orjson`: https://github.com/ijl/orjson
+    '''
+    if orjson is not None:
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            pass
+    return json.dumps(message).encode('utf-8')
+
+
+def decode_message(message_json):
+    '''
+    Deserialize json message.
+
+    If the optional `orjson`_ package is installed, it is used to deserialize
+    the message.
+
+    Parameters
+    ----------
+    message_json : bytes, str, or memoryview
+        Message serialized as json.
+
+        A :class:`memoryview` (e.g., :attr:`zmq.Frame.buffer`) is decoded
+        without copying if `orjson`_ is installed.
+
+    Returns
+    -------
+    dict
+        Decoded message.  A :class:`ValueError` is raised if message is not
+        valid json.
+
+
+    .. _`orjson`: https://github.com/ijl/orjson
+    '''
+    if orjson is not None:
+        return orjson.loads(message_json)
+    if isinstance(message_json, memoryview):
+        message_json = message_json.tobytes()
+    return json.loads(message_json)
+
+
+def decode_content_data(message, validated=False):
     '''
     Validate message and decode data from content according to mime-type.
 
@@ -225,6 +365,9 @@ def decode_content_data(message):
     ----------
     message : dict
         One of the message types defined in :data:`MESSAGE_SCHEMA`.
+    validated : bool, optional
+        If ``True``, :data:`message` has already been validated (e.g., when it
+        was received) and is not validated again.
 
     Returns
     -------
@@ -236,7 +379,8 @@ def decode_content_data(message):
     RuntimeError
         If ``content['error']`` field is set.
     '''
-    validate(message)
+    if not validated:
+        validate(message)
 
     error = message['content'].get('error', None)
     if error is not None:
@@ -265,10 +409,12 @@ def decode_content_data(message):
         # Pickle object.
         return pickle.loads(data)
     elif mime_type == 'application/x-yaml':
-        return yaml.loads(data)
+        return yaml.safe_load(data)
     elif mime_type == 'application/json':
         return json.loads(data)
-    elif mime_type in ('application/octet-stream', 'text/plain'):
+    elif mime_type == 'text/plain':
+        return data.decode('utf-8') if isinstance(data, bytes) else data
+    elif mime_type == 'application/octet-stream':
         return data
     else:
         raise ValueError('Unrecognized mime-type: %s' % mime_type)
@@ -283,7 +429,7 @@ def encode_content_data(data, mime_type='application/python-pickle',
             # Pickle object.
             content['data'] = pickle.dumps(data, protocol=-1)
         elif mime_type == 'application/x-yaml':
-            content['data'] = yaml.dumps(data)
+            content['data'] = yaml.safe_dump(data)
         elif mime_type is None or mime_type in ('application/octet-stream',
                                                 'application/json',
                                                 'text/plain'):
@@ -293,7 +439,11 @@ def encode_content_data(data, mime_type='application/python-pickle',
         #
         # [1]: https://www.w3.org/Protocols/rfc1341/5_Content-Transfer-Encoding.html
         if transfer_encoding == 'BASE64':
-            content['data'] = base64.b64encode(content['data'])
+            data_bytes = content['data']
+            if isinstance(data_bytes, str):
+                data_bytes = data_bytes.encode('utf-8')
+            # N.B., base64 output is ASCII; decode to text for json.
+            content['data'] = base64.b64encode(data_bytes).decode('ascii')
 
         if mime_type is not None:
             content['metadata'] = {'mime_type': mime_type}